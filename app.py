@@ -1,10 +1,50 @@
-import re
 from pathlib import Path
 
-import pandas as pd
 import streamlit as st
+from PIL import Image
+
+from core import (
+    build_inverters,
+    build_lbd_metadata,
+    build_result_tables,
+    find_best_distribution,
+    parse_lbd_row,
+    parse_string_quantities
+)
 
 
+# ============================================================
+# STATIC CONTENT
+# ============================================================
+# Defined once at import time so reruns reference existing strings
+# instead of rebuilding the multi-line literals in the script body.
+MAIN_BLOCK_OPEN_HTML = "<div class='main-block'>"
+MAIN_BLOCK_CLOSE_HTML = "</div>"
+
+HEADER_CARDS_HTML = """
+    <div class="card">
+        <h2>Inverter Loading Ratio Calculation</h2>
+        <p>
+            Physical-aware distribution of LBD circuits across skid inverters.
+            The tool balances total strings and ILR while minimizing North/South
+            circuit crossings.
+        </p>
+    </div>
+    <div class="card">
+        <h3>Optimization Logic</h3>
+        <ol>
+            <li>Minimize the maximum inverter loading deviation.</li>
+            <li>Minimize total loading variation between inverters.</li>
+            <li>Minimize the number of North/South circuit crossings.</li>
+            <li>For equivalent solutions, select crossings closest to the skid.</li>
+        </ol>
+        <p>
+            North rows are prioritized from the last added row toward the first row.
+            South rows are prioritized from the first added row toward the last row.
+        </p>
+    </div>
+    """
+
 
 # ============================================================
 # PAGE CONFIGURATION
@@ -27,517 +67,52 @@ if "south_row_count" not in st.session_state:
 
 
 # ============================================================
-# HELPER FUNCTIONS
+# CACHED ENTRY POINTS
 # ============================================================
-def parse_string_quantities(text):
-    """
-    Accepts only positive integer quantities separated by spaces or line breaks.
-
-    Example:
-    20 20 20 16 16
-    """
-    cleaned = text.strip()
-
-    if not cleaned:
-        raise ValueError("String quantities cannot be blank.")
-
-    if "," in cleaned:
-        raise ValueError(
-            "Use spaces between string quantities. Commas are not allowed."
-        )
-
-    if not re.fullmatch(r"\d+(\s+\d+)*", cleaned):
-        raise ValueError(
-            "String quantities must contain only positive integers separated by spaces."
-        )
-
-    values = [int(value) for value in cleaned.split()]
-
-    if any(value <= 0 for value in values):
-        raise ValueError("All string quantities must be greater than zero.")
-
-    return values
-
-
-def parse_lbd_row(text):
-    """
-    Parses LBD rows.
-
-    Accepted examples:
-    1 2 3 4 5
-    11-15
-    1 2 10-14 20
-
-    Supports hyphen, en dash, and em dash.
-    """
-    cleaned = text.strip()
-
-    if not cleaned:
-        return []
-
-    cleaned = re.sub(r"\s*[-–—]\s*", "-", cleaned)
-    tokens = cleaned.split()
-
-    lbd_numbers = []
-
-    for token in tokens:
-        match = re.fullmatch(r"(\d+)(?:-(\d+))?", token)
-
-        if not match:
-            raise ValueError(
-                f"Invalid LBD entry '{token}'. Use values such as 1 2 3 or 11-15."
-            )
-
-        start = int(match.group(1))
-        end = int(match.group(2)) if match.group(2) else start
-
-        if start <= 0 or end <= 0:
-            raise ValueError("LBD numbers must be greater than zero.")
-
-        if end < start:
-            raise ValueError(
-                f"Invalid range '{token}'. The final number must be greater than or equal to the first."
-            )
-
-        lbd_numbers.extend(range(start, end + 1))
+@st.cache_resource(show_spinner=False)
+def load_logo(path):
+    """Reads and decodes the logo once per process instead of on every rerun."""
+    return Image.open(path).copy()
 
-    return lbd_numbers
 
-
-def lbd_name(number):
-    """Returns LBD01, LBD02 ... LBD100, etc."""
-    return f"LBD{number:02d}"
-
-
-def build_lbd_metadata(
+@st.cache_data(show_spinner=False)
+def cached_distribution(
     string_quantities,
     north_rows,
     south_rows,
+    number_north,
+    number_south,
     physical_layout_enabled
 ):
     """
-    Creates the LBD data structure.
-
-    North:
-    - Last entered North row is closest to the skid.
-    - Example with 3 rows:
-      North Row 1 -> distance 3
-      North Row 2 -> distance 2
-      North Row 3 -> distance 1
-
-    South:
-    - First entered South row is closest to the skid.
-    - Example with 3 rows:
-      South Row 1 -> distance 1
-      South Row 2 -> distance 2
-      South Row 3 -> distance 3
-    """
-    total_lbds = len(string_quantities)
-
-    lbd_data = []
-
-    if not physical_layout_enabled:
-        for index, strings in enumerate(string_quantities, start=1):
-            lbd_data.append({
-                "lbd_number": index,
-                "lbd": lbd_name(index),
-                "strings": strings,
-                "reference_side": "Unrestricted",
-                "reference_row": None,
-                "distance_to_skid": 0
-            })
-
-        return lbd_data
-
-    side_mapping = {}
-
-    # North rows:
-    # Last row added is closest to the skid.
-    north_total_rows = len(north_rows)
-
-    for row_index, row_lbd_numbers in enumerate(north_rows, start=1):
-        distance_to_skid = north_total_rows - row_index + 1
-
-        for lbd_number in row_lbd_numbers:
-            if lbd_number in side_mapping:
-                raise ValueError(
-                    f"{lbd_name(lbd_number)} was entered more than once."
-                )
-
-            side_mapping[lbd_number] = {
-                "reference_side": "North",
-                "reference_row": row_index,
-                "distance_to_skid": distance_to_skid
-            }
-
-    # South rows:
-    # First row added is closest to the skid.
-    for row_index, row_lbd_numbers in enumerate(south_rows, start=1):
-        distance_to_skid = row_index
-
-        for lbd_number in row_lbd_numbers:
-            if lbd_number in side_mapping:
-                raise ValueError(
-                    f"{lbd_name(lbd_number)} was entered more than once."
-                )
-
-            side_mapping[lbd_number] = {
-                "reference_side": "South",
-                "reference_row": row_index,
-                "distance_to_skid": distance_to_skid
-            }
-
-    invalid_lbds = [
-        number for number in side_mapping
-        if number < 1 or number > total_lbds
-    ]
-
-    if invalid_lbds:
-        invalid_names = ", ".join(lbd_name(number) for number in invalid_lbds)
-        raise ValueError(
-            f"The following LBDs are outside the available string quantity list: "
-            f"{invalid_names}"
-        )
-
-    expected_lbds = set(range(1, total_lbds + 1))
-    assigned_lbds = set(side_mapping.keys())
-
-    missing_lbds = sorted(expected_lbds - assigned_lbds)
-
-    if missing_lbds:
-        missing_names = ", ".join(lbd_name(number) for number in missing_lbds)
-        raise ValueError(
-            f"Every LBD must be assigned to North or South. Missing: {missing_names}"
-        )
-
-    for index, strings in enumerate(string_quantities, start=1):
-        location = side_mapping[index]
-
-        lbd_data.append({
-            "lbd_number": index,
-            "lbd": lbd_name(index),
-            "strings": strings,
-            "reference_side": location["reference_side"],
-            "reference_row": location["reference_row"],
-            "distance_to_skid": location["distance_to_skid"]
-        })
-
-    return lbd_data
-
-
-def build_inverters(number_north, number_south):
-    """
-    Inverter numbering follows the requested TMEIC skid convention:
-
-    South inverters first:
-    Inv 1, Inv 2, Inv 3...
-
-    North inverters continue afterward:
-    Inv 4, Inv 5...
-    """
-    inverters = []
-    inverter_number = 1
-
-    for _ in range(number_south):
-        inverters.append({
-            "name": f"Inv {inverter_number}",
-            "side": "South"
-        })
-        inverter_number += 1
-
-    for _ in range(number_north):
-        inverters.append({
-            "name": f"Inv {inverter_number}",
-            "side": "North"
-        })
-        inverter_number += 1
-
-    return inverters
-
-
-def calculate_loads(lbd_data, assignment, inverter_count):
-    """Calculates total strings assigned to each inverter."""
-    loads = [0] * inverter_count
-
-    for lbd_index, inverter_index in enumerate(assignment):
-        loads[inverter_index] += lbd_data[lbd_index]["strings"]
-
-    return loads
-
-
-def calculate_objective(
-    lbd_data,
-    assignment,
-    inverters,
-    physical_layout_enabled
-):
-    """
-    Optimization priority:
+    Memoized distribution run for Streamlit reruns.
 
-    1. Minimize the maximum difference from the average inverter loading.
-    2. Minimize the total squared deviation from the average loading.
-    3. Minimize total number of North/South crossings.
-    4. Minimize crossing distance from the skid.
-
-    Therefore, crossing circuits are only selected when they improve
-    the electrical balance or are necessary to reach an equivalent
-    electrical balance.
+    Inputs are passed as tuples so identical parameters hit the cache
+    and skip the greedy allocation and iterative improvement entirely.
     """
-    inverter_count = len(inverters)
-    loads = calculate_loads(lbd_data, assignment, inverter_count)
-
-    total_strings = sum(loads)
-    target = total_strings / inverter_count
-
-    deviations = [abs(load - target) for load in loads]
-    max_deviation = max(deviations)
-    squared_deviation = sum((load - target) ** 2 for load in loads)
-
-    if not physical_layout_enabled:
-        return (
-            round(max_deviation, 8),
-            round(squared_deviation, 8)
-        )
-
-    crossing_count = 0
-    crossing_distance = 0
-
-    for lbd_index, inverter_index in enumerate(assignment):
-        lbd = lbd_data[lbd_index]
-        inverter = inverters[inverter_index]
-
-        if lbd["reference_side"] != inverter["side"]:
-            crossing_count += 1
-            crossing_distance += lbd["distance_to_skid"]
-
-    return (
-        round(max_deviation, 8),
-        round(squared_deviation, 8),
-        crossing_count,
-        crossing_distance
+    lbd_data = build_lbd_metadata(
+        string_quantities=string_quantities,
+        north_rows=north_rows,
+        south_rows=south_rows,
+        physical_layout_enabled=physical_layout_enabled
     )
 
-
-def greedy_initial_assignment(
-    lbd_data,
-    inverters,
-    physical_layout_enabled,
-    respect_physical_side=True
-):
-    """
-    Creates an initial LPT/greedy allocation.
-
-    When respect_physical_side=True:
-    LBDs are initially allocated only to inverters on their own side.
-
-    When respect_physical_side=False:
-    The allocation ignores North/South location and balances purely
-    based on string quantities.
-    """
-    inverter_count = len(inverters)
-    assignment = [-1] * len(lbd_data)
-    loads = [0] * inverter_count
-
-    # Larger blocks first.
-    sorted_indices = sorted(
-        range(len(lbd_data)),
-        key=lambda i: (
-            -lbd_data[i]["strings"],
-            lbd_data[i]["distance_to_skid"]
-        )
+    inverters = build_inverters(
+        number_north=number_north,
+        number_south=number_south
     )
 
-    for lbd_index in sorted_indices:
-        lbd = lbd_data[lbd_index]
-
-        if physical_layout_enabled and respect_physical_side:
-            candidate_inverters = [
-                index
-                for index, inverter in enumerate(inverters)
-                if inverter["side"] == lbd["reference_side"]
-            ]
-
-            if not candidate_inverters:
-                raise ValueError(
-                    f"{lbd['lbd']} is on the {lbd['reference_side']} side, "
-                    f"but there are no inverters configured on that side."
-                )
-        else:
-            candidate_inverters = list(range(inverter_count))
-
-        chosen_inverter = min(
-            candidate_inverters,
-            key=lambda inverter_index: (
-                loads[inverter_index],
-                inverter_index
-            )
-        )
-
-        assignment[lbd_index] = chosen_inverter
-        loads[chosen_inverter] += lbd["strings"]
-
-    return assignment
-
-
-def optimize_assignment(
-    lbd_data,
-    initial_assignment,
-    inverters,
-    physical_layout_enabled,
-    max_iterations=250
-):
-    """
-    Applies iterative improvement using:
-
-    - Individual LBD moves
-    - LBD swaps between inverter assignments
-
-    This improves the initial greedy distribution while preserving
-    the optimization priority defined in calculate_objective().
-    """
-    current_assignment = initial_assignment.copy()
-
-    current_objective = calculate_objective(
-        lbd_data,
-        current_assignment,
-        inverters,
-        physical_layout_enabled
+    assignment, objective = find_best_distribution(
+        lbd_data=lbd_data,
+        inverters=inverters,
+        physical_layout_enabled=physical_layout_enabled
     )
 
-    inverter_count = len(inverters)
-    lbd_count = len(lbd_data)
-
-    for _ in range(max_iterations):
-        best_assignment = current_assignment
-        best_objective = current_objective
-        improvement_found = False
+    return lbd_data, inverters, assignment, objective
 
-        # ----------------------------------------------------
-        # INDIVIDUAL LBD MOVES
-        # ----------------------------------------------------
-        for lbd_index in range(lbd_count):
-            current_inverter = current_assignment[lbd_index]
 
-            for candidate_inverter in range(inverter_count):
-                if candidate_inverter == current_inverter:
-                    continue
-
-                candidate_assignment = current_assignment.copy()
-                candidate_assignment[lbd_index] = candidate_inverter
-
-                candidate_objective = calculate_objective(
-                    lbd_data,
-                    candidate_assignment,
-                    inverters,
-                    physical_layout_enabled
-                )
-
-                if candidate_objective < best_objective:
-                    best_assignment = candidate_assignment
-                    best_objective = candidate_objective
-                    improvement_found = True
-
-        # ----------------------------------------------------
-        # SWAPS BETWEEN TWO LBDS
-        # ----------------------------------------------------
-        for first_lbd in range(lbd_count):
-            for second_lbd in range(first_lbd + 1, lbd_count):
-                first_inverter = current_assignment[first_lbd]
-                second_inverter = current_assignment[second_lbd]
-
-                if first_inverter == second_inverter:
-                    continue
-
-                candidate_assignment = current_assignment.copy()
-                candidate_assignment[first_lbd] = second_inverter
-                candidate_assignment[second_lbd] = first_inverter
-
-                candidate_objective = calculate_objective(
-                    lbd_data,
-                    candidate_assignment,
-                    inverters,
-                    physical_layout_enabled
-                )
-
-                if candidate_objective < best_objective:
-                    best_assignment = candidate_assignment
-                    best_objective = candidate_objective
-                    improvement_found = True
-
-        if not improvement_found:
-            break
-
-        current_assignment = best_assignment
-        current_objective = best_objective
-
-    return current_assignment, current_objective
-
-
-def find_best_distribution(
-    lbd_data,
-    inverters,
-    physical_layout_enabled
-):
-    """
-    Runs more than one starting point and retains the best final result.
-
-    Starting point 1:
-    Physical-side-first allocation.
-
-    Starting point 2:
-    Pure mathematical/global allocation.
-
-    The final result is selected using the same objective hierarchy.
-    """
-    candidate_assignments = []
-
-    if physical_layout_enabled:
-        candidate_assignments.append(
-            greedy_initial_assignment(
-                lbd_data,
-                inverters,
-                physical_layout_enabled=True,
-                respect_physical_side=True
-            )
-        )
-
-        candidate_assignments.append(
-            greedy_initial_assignment(
-                lbd_data,
-                inverters,
-                physical_layout_enabled=True,
-                respect_physical_side=False
-            )
-        )
-    else:
-        candidate_assignments.append(
-            greedy_initial_assignment(
-                lbd_data,
-                inverters,
-                physical_layout_enabled=False,
-                respect_physical_side=False
-            )
-        )
-
-    best_assignment = None
-    best_objective = None
-
-    for initial_assignment in candidate_assignments:
-        optimized_assignment, objective = optimize_assignment(
-            lbd_data=lbd_data,
-            initial_assignment=initial_assignment,
-            inverters=inverters,
-            physical_layout_enabled=physical_layout_enabled
-        )
-
-        if best_objective is None or objective < best_objective:
-            best_assignment = optimized_assignment
-            best_objective = objective
-
-    return best_assignment, best_objective
-
-
-def build_result_tables(
+@st.cache_data(show_spinner=False)
+def cached_result_tables(
     lbd_data,
     assignment,
     inverters,
@@ -546,80 +121,27 @@ def build_result_tables(
     inverter_power_kva,
     physical_layout_enabled
 ):
-    """Builds the inverter summary and LBD-level assignment tables."""
-    inverter_count = len(inverters)
-    loads = calculate_loads(lbd_data, assignment, inverter_count)
-
-    summary_rows = []
-
-    for inverter_index, inverter in enumerate(inverters):
-        total_strings = loads[inverter_index]
-        dc_power_kw = (
-            total_strings
-            * modules_per_string
-            * module_power_w
-            / 1000
-        )
+    """Memoized wrapper around build_result_tables()."""
+    return build_result_tables(
+        lbd_data=lbd_data,
+        assignment=assignment,
+        inverters=inverters,
+        modules_per_string=modules_per_string,
+        module_power_w=module_power_w,
+        inverter_power_kva=inverter_power_kva,
+        physical_layout_enabled=physical_layout_enabled
+    )
 
-        ilr = (
-            dc_power_kw / inverter_power_kva
-            if inverter_power_kva > 0
-            else 0
-        )
 
-        assigned_lbds = [
-            lbd_data[lbd_index]["lbd"]
-            for lbd_index, assigned_inverter in enumerate(assignment)
-            if assigned_inverter == inverter_index
-        ]
-
-        summary_rows.append({
-            "Inverter": inverter["name"],
-            "Side": inverter["side"],
-            "Total Strings": total_strings,
-            "DC Power (kW)": round(dc_power_kw, 2),
-            "ILR": round(ilr, 3),
-            "Assigned LBDs": ", ".join(assigned_lbds)
-        })
-
-    assignment_rows = []
-
-    for lbd_index, inverter_index in enumerate(assignment):
-        lbd = lbd_data[lbd_index]
-        inverter = inverters[inverter_index]
-
-        is_crossing = (
-            physical_layout_enabled
-            and lbd["reference_side"] != inverter["side"]
-        )
+@st.cache_data(show_spinner=False)
+def cached_chart_frame(summary_df, column):
+    """
+    Memoized single-column chart frame indexed by inverter name.
 
-        if is_crossing:
-            crossing_direction = (
-                f"{lbd['reference_side']} → {inverter['side']}"
-            )
-        else:
-            crossing_direction = ""
-
-        assignment_rows.append({
-            "LBD": lbd["lbd"],
-            "Strings": lbd["strings"],
-            "Reference Side": lbd["reference_side"],
-            "Reference Row": (
-                f"Row {lbd['reference_row']}"
-                if lbd["reference_row"] is not None
-                else ""
-            ),
-            "Distance to Skid": lbd["distance_to_skid"],
-            "Assigned Inverter": inverter["name"],
-            "Inverter Side": inverter["side"],
-            "Crossing Required": "Yes" if is_crossing else "No",
-            "Crossing Direction": crossing_direction
-        })
-
-    summary_df = pd.DataFrame(summary_rows)
-    assignment_df = pd.DataFrame(assignment_rows)
-
-    return summary_df, assignment_df
+    On a cache hit Streamlit reuses the already-serialized frame, so
+    unchanged results skip the Arrow conversion for the bar charts.
+    """
+    return summary_df.set_index("Inverter")[[column]]
 
 
 # ============================================================
@@ -779,45 +301,16 @@ with st.sidebar:
 # ============================================================
 # HEADER
 # ============================================================
-st.markdown("<div class='main-block'>", unsafe_allow_html=True)
+st.markdown(MAIN_BLOCK_OPEN_HTML, unsafe_allow_html=True)
 
 logo_path = Path("rrc.png")
 
 if logo_path.exists():
-    st.image(str(logo_path), width=85)
-
-st.markdown(
-    """
-    <div class="card">
-        <h2>Inverter Loading Ratio Calculation</h2>
-        <p>
-            Physical-aware distribution of LBD circuits across skid inverters.
-            The tool balances total strings and ILR while minimizing North/South
-            circuit crossings.
-        </p>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+    st.image(load_logo(str(logo_path)), width=85)
 
-st.markdown(
-    """
-    <div class="card">
-        <h3>Optimization Logic</h3>
-        <ol>
-            <li>Minimize the maximum inverter loading deviation.</li>
-            <li>Minimize total loading variation between inverters.</li>
-            <li>Minimize the number of North/South circuit crossings.</li>
-            <li>For equivalent solutions, select crossings closest to the skid.</li>
-        </ol>
-        <p>
-            North rows are prioritized from the last added row toward the first row.
-            South rows are prioritized from the first added row toward the last row.
-        </p>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+# Both header cards are emitted in a single st.markdown call so the
+# frontend receives one element message instead of one per card.
+st.markdown(HEADER_CARDS_HTML, unsafe_allow_html=True)
 
 
 # ============================================================
@@ -860,25 +353,16 @@ if run_button:
             north_rows = []
             south_rows = []
 
-        lbd_data = build_lbd_metadata(
-            string_quantities=string_quantities,
-            north_rows=north_rows,
-            south_rows=south_rows,
-            physical_layout_enabled=physical_layout_enabled
-        )
-
-        inverters = build_inverters(
+        lbd_data, inverters, assignment, objective = cached_distribution(
+            string_quantities=tuple(string_quantities),
+            north_rows=tuple(tuple(row) for row in north_rows),
+            south_rows=tuple(tuple(row) for row in south_rows),
             number_north=int(number_inverters_north),
-            number_south=int(number_inverters_south)
-        )
-
-        assignment, objective = find_best_distribution(
-            lbd_data=lbd_data,
-            inverters=inverters,
+            number_south=int(number_inverters_south),
             physical_layout_enabled=physical_layout_enabled
         )
 
-        summary_df, assignment_df = build_result_tables(
+        summary_df, assignment_df = cached_result_tables(
             lbd_data=lbd_data,
             assignment=assignment,
             inverters=inverters,
@@ -888,16 +372,23 @@ if run_button:
             physical_layout_enabled=physical_layout_enabled
         )
 
-        total_strings = summary_df["Total Strings"].sum()
+        # Each column is extracted once and reduced with NumPy instead
+        # of dispatching a separate pandas reduction per statistic.
+        string_values = summary_df["Total Strings"].to_numpy()
+        ilr_values = summary_df["ILR"].to_numpy()
+
+        total_strings = string_values.sum()
         average_strings = total_strings / len(summary_df)
-        min_strings = summary_df["Total Strings"].min()
-        max_strings = summary_df["Total Strings"].max()
-        max_string_difference = max_strings - min_strings
+        max_string_difference = string_values.max() - string_values.min()
 
-        ilr_mean = summary_df["ILR"].mean()
-        ilr_min = summary_df["ILR"].min()
-        ilr_max = summary_df["ILR"].max()
-        ilr_std = summary_df["ILR"].std()
+        ilr_mean = ilr_values.mean()
+        ilr_min = ilr_values.min()
+        ilr_max = ilr_values.max()
+        ilr_std = (
+            ilr_values.std(ddof=1)
+            if ilr_values.size > 1
+            else float("nan")
+        )
 
         crossing_df = assignment_df[
             assignment_df["Crossing Required"] == "Yes"
@@ -961,15 +452,11 @@ if run_button:
 
         with chart_col_1:
             st.markdown("### Strings per Inverter")
-
-            string_chart_df = summary_df.set_index("Inverter")[["Total Strings"]]
-            st.bar_chart(string_chart_df)
+            st.bar_chart(cached_chart_frame(summary_df, "Total Strings"))
 
         with chart_col_2:
             st.markdown("### ILR per Inverter")
-
-            ilr_chart_df = summary_df.set_index("Inverter")[["ILR"]]
-            st.bar_chart(ilr_chart_df)
+            st.bar_chart(cached_chart_frame(summary_df, "ILR"))
 
         # ====================================================
         # LBD ASSIGNMENT TABLE
@@ -1043,4 +530,4 @@ if run_button:
     except Exception as error:
         st.error(f"Error: {error}")
 
-st.markdown("</div>", unsafe_allow_html=True)
+st.markdown(MAIN_BLOCK_CLOSE_HTML, unsafe_allow_html=True)
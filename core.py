@@ -0,0 +1,793 @@
+"""
+Core distribution logic for the ILR calculation tool.
+
+Pure input parsing, allocation, and table-building functions with no
+Streamlit dependency. Keeping them outside app.py means UI edits do
+not invalidate st.cache_data entries keyed on these functions.
+"""
+import heapq
+import itertools
+import re
+
+import numpy as np
+import pandas as pd
+
+# Numba is optional: when it is installed, very large unrestricted
+# allocations are handled by a JIT-compiled greedy kernel.
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+# ============================================================
+# HELPER FUNCTIONS
+# ============================================================
+def parse_string_quantities(text):
+    """
+    Accepts only positive integer quantities separated by spaces or line breaks.
+
+    Example:
+    20 20 20 16 16
+    """
+    cleaned = text.strip()
+
+    if not cleaned:
+        raise ValueError("String quantities cannot be blank.")
+
+    if "," in cleaned:
+        raise ValueError(
+            "Use spaces between string quantities. Commas are not allowed."
+        )
+
+    if not re.fullmatch(r"\d+(\s+\d+)*", cleaned):
+        raise ValueError(
+            "String quantities must contain only positive integers separated by spaces."
+        )
+
+    # The regex above guarantees whitespace-separated digits, so the
+    # actual parse can run in C instead of one int() call per token.
+    values = np.fromstring(cleaned, dtype=np.int64, sep=" ")
+
+    if (values <= 0).any():
+        raise ValueError("All string quantities must be greater than zero.")
+
+    return values.tolist()
+
+
+def parse_lbd_row(text):
+    """
+    Parses LBD rows.
+
+    Accepted examples:
+    1 2 3 4 5
+    11-15
+    1 2 10-14 20
+
+    Supports hyphen, en dash, and em dash.
+    """
+    cleaned = text.strip()
+
+    if not cleaned:
+        return []
+
+    cleaned = re.sub(r"\s*[-–—]\s*", "-", cleaned)
+    tokens = cleaned.split()
+
+    lbd_numbers = []
+
+    for token in tokens:
+        match = re.fullmatch(r"(\d+)(?:-(\d+))?", token)
+
+        if not match:
+            raise ValueError(
+                f"Invalid LBD entry '{token}'. Use values such as 1 2 3 or 11-15."
+            )
+
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else start
+
+        if start <= 0 or end <= 0:
+            raise ValueError("LBD numbers must be greater than zero.")
+
+        if end < start:
+            raise ValueError(
+                f"Invalid range '{token}'. The final number must be greater than or equal to the first."
+            )
+
+        lbd_numbers.extend(range(start, end + 1))
+
+    return lbd_numbers
+
+
+def lbd_name(number):
+    """Returns LBD01, LBD02 ... LBD100, etc."""
+    return f"LBD{number:02d}"
+
+
+def build_lbd_metadata(
+    string_quantities,
+    north_rows,
+    south_rows,
+    physical_layout_enabled
+):
+    """
+    Creates the LBD data structure.
+
+    North:
+    - Last entered North row is closest to the skid.
+    - Example with 3 rows:
+      North Row 1 -> distance 3
+      North Row 2 -> distance 2
+      North Row 3 -> distance 1
+
+    South:
+    - First entered South row is closest to the skid.
+    - Example with 3 rows:
+      South Row 1 -> distance 1
+      South Row 2 -> distance 2
+      South Row 3 -> distance 3
+    """
+    total_lbds = len(string_quantities)
+
+    lbd_data = []
+
+    if not physical_layout_enabled:
+        for index, strings in enumerate(string_quantities, start=1):
+            lbd_data.append({
+                "lbd_number": index,
+                "lbd": lbd_name(index),
+                "strings": strings,
+                "reference_side": "Unrestricted",
+                "reference_row": None,
+                "distance_to_skid": 0
+            })
+
+        return lbd_data
+
+    side_mapping = {}
+
+    # North rows:
+    # Last row added is closest to the skid.
+    north_total_rows = len(north_rows)
+
+    for row_index, row_lbd_numbers in enumerate(north_rows, start=1):
+        distance_to_skid = north_total_rows - row_index + 1
+
+        for lbd_number in row_lbd_numbers:
+            if lbd_number in side_mapping:
+                raise ValueError(
+                    f"{lbd_name(lbd_number)} was entered more than once."
+                )
+
+            side_mapping[lbd_number] = {
+                "reference_side": "North",
+                "reference_row": row_index,
+                "distance_to_skid": distance_to_skid
+            }
+
+    # South rows:
+    # First row added is closest to the skid.
+    for row_index, row_lbd_numbers in enumerate(south_rows, start=1):
+        distance_to_skid = row_index
+
+        for lbd_number in row_lbd_numbers:
+            if lbd_number in side_mapping:
+                raise ValueError(
+                    f"{lbd_name(lbd_number)} was entered more than once."
+                )
+
+            side_mapping[lbd_number] = {
+                "reference_side": "South",
+                "reference_row": row_index,
+                "distance_to_skid": distance_to_skid
+            }
+
+    invalid_lbds = [
+        number for number in side_mapping
+        if number < 1 or number > total_lbds
+    ]
+
+    if invalid_lbds:
+        invalid_names = ", ".join(lbd_name(number) for number in invalid_lbds)
+        raise ValueError(
+            f"The following LBDs are outside the available string quantity list: "
+            f"{invalid_names}"
+        )
+
+    expected_lbds = set(range(1, total_lbds + 1))
+    assigned_lbds = set(side_mapping.keys())
+
+    missing_lbds = sorted(expected_lbds - assigned_lbds)
+
+    if missing_lbds:
+        missing_names = ", ".join(lbd_name(number) for number in missing_lbds)
+        raise ValueError(
+            f"Every LBD must be assigned to North or South. Missing: {missing_names}"
+        )
+
+    for index, strings in enumerate(string_quantities, start=1):
+        location = side_mapping[index]
+
+        lbd_data.append({
+            "lbd_number": index,
+            "lbd": lbd_name(index),
+            "strings": strings,
+            "reference_side": location["reference_side"],
+            "reference_row": location["reference_row"],
+            "distance_to_skid": location["distance_to_skid"]
+        })
+
+    return lbd_data
+
+
+def build_inverters(number_north, number_south):
+    """
+    Inverter numbering follows the requested TMEIC skid convention:
+
+    South inverters first:
+    Inv 1, Inv 2, Inv 3...
+
+    North inverters continue afterward:
+    Inv 4, Inv 5...
+    """
+    inverters = []
+    inverter_number = 1
+
+    for _ in range(number_south):
+        inverters.append({
+            "name": f"Inv {inverter_number}",
+            "side": "South"
+        })
+        inverter_number += 1
+
+    for _ in range(number_north):
+        inverters.append({
+            "name": f"Inv {inverter_number}",
+            "side": "North"
+        })
+        inverter_number += 1
+
+    return inverters
+
+
+def calculate_loads(lbd_data, assignment, inverter_count):
+    """Calculates total strings assigned to each inverter."""
+    loads = [0] * inverter_count
+
+    for lbd_index, inverter_index in enumerate(assignment):
+        loads[inverter_index] += lbd_data[lbd_index]["strings"]
+
+    return loads
+
+
+def calculate_objective(
+    lbd_data,
+    assignment,
+    inverters,
+    physical_layout_enabled
+):
+    """
+    Optimization priority:
+
+    1. Minimize the maximum difference from the average inverter loading.
+    2. Minimize the total squared deviation from the average loading.
+    3. Minimize total number of North/South crossings.
+    4. Minimize crossing distance from the skid.
+
+    Therefore, crossing circuits are only selected when they improve
+    the electrical balance or are necessary to reach an equivalent
+    electrical balance.
+    """
+    inverter_count = len(inverters)
+    loads = calculate_loads(lbd_data, assignment, inverter_count)
+
+    total_strings = sum(loads)
+    target = total_strings / inverter_count
+
+    deviations = [abs(load - target) for load in loads]
+    max_deviation = max(deviations)
+    squared_deviation = sum((load - target) ** 2 for load in loads)
+
+    if not physical_layout_enabled:
+        return (
+            round(max_deviation, 8),
+            round(squared_deviation, 8)
+        )
+
+    crossing_count = 0
+    crossing_distance = 0
+
+    for lbd_index, inverter_index in enumerate(assignment):
+        lbd = lbd_data[lbd_index]
+        inverter = inverters[inverter_index]
+
+        if lbd["reference_side"] != inverter["side"]:
+            crossing_count += 1
+            crossing_distance += lbd["distance_to_skid"]
+
+    return (
+        round(max_deviation, 8),
+        round(squared_deviation, 8),
+        crossing_count,
+        crossing_distance
+    )
+
+
+def calculate_objective_arrays(
+    assignment,
+    strings,
+    lbd_sides,
+    distances_to_skid,
+    inverter_sides,
+    inverter_count,
+    physical_layout_enabled
+):
+    """
+    Vectorized equivalent of calculate_objective() over precomputed
+    NumPy arrays.
+
+    optimize_assignment() evaluates thousands of candidate moves and
+    swaps per iteration, so the loads and deviations are reduced with
+    C-level NumPy kernels instead of Python-level scans over lists.
+    """
+    loads = np.bincount(
+        assignment,
+        weights=strings,
+        minlength=inverter_count
+    )
+
+    target = loads.sum() / inverter_count
+    deviations = loads - target
+
+    max_deviation = float(np.abs(deviations).max())
+    squared_deviation = float((deviations * deviations).sum())
+
+    if not physical_layout_enabled:
+        return (
+            round(max_deviation, 8),
+            round(squared_deviation, 8)
+        )
+
+    crossings = lbd_sides != inverter_sides[assignment]
+
+    return (
+        round(max_deviation, 8),
+        round(squared_deviation, 8),
+        int(crossings.sum()),
+        int(distances_to_skid[crossings].sum())
+    )
+
+
+# Above this many LBD-inverter pairs the one-off JIT compilation pays
+# for itself; below it the heap-based loop is faster.
+NUMBA_GREEDY_THRESHOLD = 100_000
+
+if njit is not None:
+    @njit(cache=True)
+    def greedy_assignment_kernel(sorted_strings, inverter_count):
+        """
+        Greedy least-loaded assignment compiled with Numba.
+
+        Takes string counts already sorted in allocation order and
+        returns the chosen inverter per position. Ties break on the
+        lowest inverter index, matching the heap-based loop.
+        """
+        loads = np.zeros(inverter_count, dtype=np.int64)
+        assignment = np.empty(sorted_strings.size, dtype=np.int64)
+
+        for position in range(sorted_strings.size):
+            chosen = 0
+            lowest_load = loads[0]
+
+            for inverter_index in range(1, inverter_count):
+                if loads[inverter_index] < lowest_load:
+                    lowest_load = loads[inverter_index]
+                    chosen = inverter_index
+
+            assignment[position] = chosen
+            loads[chosen] += sorted_strings[position]
+
+        return assignment
+
+
+def greedy_initial_assignment(
+    lbd_data,
+    inverters,
+    physical_layout_enabled,
+    respect_physical_side=True
+):
+    """
+    Creates an initial LPT/greedy allocation.
+
+    When respect_physical_side=True:
+    LBDs are initially allocated only to inverters on their own side.
+
+    When respect_physical_side=False:
+    The allocation ignores North/South location and balances purely
+    based on string quantities.
+
+    The least-loaded inverter is tracked with a min-heap of
+    (load, inverter_index) entries, so each allocation costs
+    O(log m) instead of scanning every inverter.
+    """
+    inverter_count = len(inverters)
+    assignment = [-1] * len(lbd_data)
+
+    side_restricted = physical_layout_enabled and respect_physical_side
+
+    # Larger blocks first.
+    sorted_indices = sorted(
+        range(len(lbd_data)),
+        key=lambda i: (
+            -lbd_data[i]["strings"],
+            lbd_data[i]["distance_to_skid"]
+        )
+    )
+
+    # MW-scale unrestricted allocations go through the JIT-compiled
+    # kernel when Numba is available.
+    if (
+        not side_restricted
+        and njit is not None
+        and len(lbd_data) * inverter_count > NUMBA_GREEDY_THRESHOLD
+    ):
+        sorted_strings = np.fromiter(
+            (lbd_data[i]["strings"] for i in sorted_indices),
+            dtype=np.int64,
+            count=len(sorted_indices)
+        )
+
+        chosen_inverters = greedy_assignment_kernel(
+            sorted_strings,
+            inverter_count
+        )
+
+        for position, lbd_index in enumerate(sorted_indices):
+            assignment[lbd_index] = int(chosen_inverters[position])
+
+        return assignment
+
+    # One heap per candidate set. With side restrictions the North and
+    # South heaps are disjoint; otherwise a single shared heap is used.
+    if side_restricted:
+        heaps = {}
+
+        for inverter_index, inverter in enumerate(inverters):
+            heaps.setdefault(inverter["side"], []).append(
+                (0, inverter_index)
+            )
+
+        for heap in heaps.values():
+            heapq.heapify(heap)
+    else:
+        shared_heap = [(0, inverter_index) for inverter_index in range(inverter_count)]
+
+    # LBDs with identical string counts (and, when restricted, the same
+    # side) are interchangeable, so they are processed as one run. PV
+    # projects typically repeat a handful of string counts, which makes
+    # these runs long in practice.
+    grouped_indices = itertools.groupby(
+        sorted_indices,
+        key=lambda i: (
+            lbd_data[i]["strings"],
+            lbd_data[i]["reference_side"] if side_restricted else None
+        )
+    )
+
+    for (strings, reference_side), run_iterator in grouped_indices:
+        run = list(run_iterator)
+
+        if side_restricted:
+            heap = heaps.get(reference_side)
+
+            if not heap:
+                raise ValueError(
+                    f"{lbd_data[run[0]]['lbd']} is on the {reference_side} side, "
+                    f"but there are no inverters configured on that side."
+                )
+        else:
+            heap = shared_heap
+
+        # Fast path: if every candidate inverter currently carries the
+        # same load, the greedy choice for an equal-value run is plain
+        # round-robin, so the run is distributed with divmod arithmetic
+        # instead of one heap operation per LBD.
+        if len(run) >= len(heap) and heap[0][0] == max(heap)[0]:
+            base_load = heap[0][0]
+            full_rounds, remainder = divmod(len(run), len(heap))
+            ordered_inverters = sorted(index for _, index in heap)
+
+            position = 0
+            heap.clear()
+
+            for rank, inverter_index in enumerate(ordered_inverters):
+                run_share = full_rounds + (1 if rank < remainder else 0)
+
+                for _ in range(run_share):
+                    assignment[run[position]] = inverter_index
+                    position += 1
+
+                heap.append(
+                    (base_load + run_share * strings, inverter_index)
+                )
+
+            heapq.heapify(heap)
+            continue
+
+        for lbd_index in run:
+            load, chosen_inverter = heapq.heappop(heap)
+
+            assignment[lbd_index] = chosen_inverter
+            heapq.heappush(heap, (load + strings, chosen_inverter))
+
+    return assignment
+
+
+def optimize_assignment(
+    lbd_data,
+    initial_assignment,
+    inverters,
+    physical_layout_enabled,
+    max_iterations=250
+):
+    """
+    Applies iterative improvement using:
+
+    - Individual LBD moves
+    - LBD swaps between inverter assignments
+
+    This improves the initial greedy distribution while preserving
+    the optimization priority defined in calculate_objective().
+
+    The LBD attributes are flattened into NumPy arrays once, so every
+    candidate evaluation runs through calculate_objective_arrays()
+    without touching the per-LBD dicts.
+    """
+    inverter_count = len(inverters)
+    lbd_count = len(lbd_data)
+
+    strings = np.fromiter(
+        (lbd["strings"] for lbd in lbd_data),
+        dtype=np.int64,
+        count=lbd_count
+    )
+
+    if physical_layout_enabled:
+        side_codes = {"North": 0, "South": 1}
+
+        lbd_sides = np.fromiter(
+            (side_codes[lbd["reference_side"]] for lbd in lbd_data),
+            dtype=np.int64,
+            count=lbd_count
+        )
+
+        distances_to_skid = np.fromiter(
+            (lbd["distance_to_skid"] for lbd in lbd_data),
+            dtype=np.int64,
+            count=lbd_count
+        )
+
+        inverter_sides = np.fromiter(
+            (side_codes[inverter["side"]] for inverter in inverters),
+            dtype=np.int64,
+            count=inverter_count
+        )
+    else:
+        lbd_sides = None
+        distances_to_skid = None
+        inverter_sides = None
+
+    def evaluate(assignment):
+        return calculate_objective_arrays(
+            assignment=assignment,
+            strings=strings,
+            lbd_sides=lbd_sides,
+            distances_to_skid=distances_to_skid,
+            inverter_sides=inverter_sides,
+            inverter_count=inverter_count,
+            physical_layout_enabled=physical_layout_enabled
+        )
+
+    current_assignment = np.asarray(initial_assignment, dtype=np.int64)
+    current_objective = evaluate(current_assignment)
+
+    for _ in range(max_iterations):
+        best_assignment = current_assignment
+        best_objective = current_objective
+        improvement_found = False
+
+        # ----------------------------------------------------
+        # INDIVIDUAL LBD MOVES
+        # ----------------------------------------------------
+        for lbd_index in range(lbd_count):
+            current_inverter = current_assignment[lbd_index]
+
+            for candidate_inverter in range(inverter_count):
+                if candidate_inverter == current_inverter:
+                    continue
+
+                candidate_assignment = current_assignment.copy()
+                candidate_assignment[lbd_index] = candidate_inverter
+
+                candidate_objective = evaluate(candidate_assignment)
+
+                if candidate_objective < best_objective:
+                    best_assignment = candidate_assignment
+                    best_objective = candidate_objective
+                    improvement_found = True
+
+        # ----------------------------------------------------
+        # SWAPS BETWEEN TWO LBDS
+        # ----------------------------------------------------
+        for first_lbd in range(lbd_count):
+            for second_lbd in range(first_lbd + 1, lbd_count):
+                first_inverter = current_assignment[first_lbd]
+                second_inverter = current_assignment[second_lbd]
+
+                if first_inverter == second_inverter:
+                    continue
+
+                candidate_assignment = current_assignment.copy()
+                candidate_assignment[first_lbd] = second_inverter
+                candidate_assignment[second_lbd] = first_inverter
+
+                candidate_objective = evaluate(candidate_assignment)
+
+                if candidate_objective < best_objective:
+                    best_assignment = candidate_assignment
+                    best_objective = candidate_objective
+                    improvement_found = True
+
+        if not improvement_found:
+            break
+
+        current_assignment = best_assignment
+        current_objective = best_objective
+
+    return current_assignment.tolist(), current_objective
+
+
+def find_best_distribution(
+    lbd_data,
+    inverters,
+    physical_layout_enabled
+):
+    """
+    Runs more than one starting point and retains the best final result.
+
+    Starting point 1:
+    Physical-side-first allocation.
+
+    Starting point 2:
+    Pure mathematical/global allocation.
+
+    The final result is selected using the same objective hierarchy.
+    """
+    candidate_assignments = []
+
+    if physical_layout_enabled:
+        candidate_assignments.append(
+            greedy_initial_assignment(
+                lbd_data,
+                inverters,
+                physical_layout_enabled=True,
+                respect_physical_side=True
+            )
+        )
+
+        candidate_assignments.append(
+            greedy_initial_assignment(
+                lbd_data,
+                inverters,
+                physical_layout_enabled=True,
+                respect_physical_side=False
+            )
+        )
+    else:
+        candidate_assignments.append(
+            greedy_initial_assignment(
+                lbd_data,
+                inverters,
+                physical_layout_enabled=False,
+                respect_physical_side=False
+            )
+        )
+
+    best_assignment = None
+    best_objective = None
+
+    for initial_assignment in candidate_assignments:
+        optimized_assignment, objective = optimize_assignment(
+            lbd_data=lbd_data,
+            initial_assignment=initial_assignment,
+            inverters=inverters,
+            physical_layout_enabled=physical_layout_enabled
+        )
+
+        if best_objective is None or objective < best_objective:
+            best_assignment = optimized_assignment
+            best_objective = objective
+
+    return best_assignment, best_objective
+
+
+def build_result_tables(
+    lbd_data,
+    assignment,
+    inverters,
+    modules_per_string,
+    module_power_w,
+    inverter_power_kva,
+    physical_layout_enabled
+):
+    """Builds the inverter summary and LBD-level assignment tables."""
+    inverter_count = len(inverters)
+    loads = calculate_loads(lbd_data, assignment, inverter_count)
+
+    # DC power and ILR are computed for all inverters in one vectorized
+    # pass instead of one Python iteration per inverter.
+    loads_array = np.asarray(loads, dtype=np.float64)
+    dc_power_kw = loads_array * modules_per_string * module_power_w / 1000
+
+    if inverter_power_kva > 0:
+        ilr = dc_power_kw / inverter_power_kva
+    else:
+        ilr = np.zeros_like(dc_power_kw)
+
+    # One pass over the assignment instead of re-scanning the full
+    # assignment list once per inverter.
+    assigned_lbds_per_inverter = [[] for _ in range(inverter_count)]
+
+    for lbd, inverter_index in zip(lbd_data, assignment):
+        assigned_lbds_per_inverter[inverter_index].append(lbd["lbd"])
+
+    summary_df = pd.DataFrame({
+        "Inverter": [inverter["name"] for inverter in inverters],
+        "Side": [inverter["side"] for inverter in inverters],
+        "Total Strings": loads,
+        "DC Power (kW)": np.round(dc_power_kw, 2),
+        "ILR": np.round(ilr, 3),
+        "Assigned LBDs": [
+            ", ".join(assigned_lbds)
+            for assigned_lbds in assigned_lbds_per_inverter
+        ]
+    })
+
+    assignment_rows = []
+
+    for lbd, inverter_index in zip(lbd_data, assignment):
+        inverter = inverters[inverter_index]
+
+        is_crossing = (
+            physical_layout_enabled
+            and lbd["reference_side"] != inverter["side"]
+        )
+
+        if is_crossing:
+            crossing_direction = (
+                f"{lbd['reference_side']} → {inverter['side']}"
+            )
+        else:
+            crossing_direction = ""
+
+        assignment_rows.append({
+            "LBD": lbd["lbd"],
+            "Strings": lbd["strings"],
+            "Reference Side": lbd["reference_side"],
+            "Reference Row": (
+                f"Row {lbd['reference_row']}"
+                if lbd["reference_row"] is not None
+                else ""
+            ),
+            "Distance to Skid": lbd["distance_to_skid"],
+            "Assigned Inverter": inverter["name"],
+            "Inverter Side": inverter["side"],
+            "Crossing Required": "Yes" if is_crossing else "No",
+            "Crossing Direction": crossing_direction
+        })
+
+    assignment_df = pd.DataFrame(assignment_rows)
+
+    return summary_df, assignment_df
+